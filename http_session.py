@@ -0,0 +1,41 @@
+# Shared HTTP session for the scraper and the Telegram test script, so every
+# request in a run goes through one connection pool.
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import brotli  # noqa: F401 - lets urllib3 decode "br" responses
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:  # pragma: no cover
+    ACCEPT_ENCODING = "gzip, deflate"
+
+# (connect, read): fail fast on an unreachable host, allow a slow body
+REQUEST_TIMEOUT = (5, 15)
+
+# One shared session so the availability GET and the Telegram POST reuse
+# pooled keep-alive connections instead of a fresh TLS handshake each.
+# Transient errors on GETs are retried in place; POSTs are never replayed.
+SESSION = requests.Session()
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=20,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods={"GET"},
+        ),
+    ),
+)
+SESSION.headers.update(
+    {
+        "User-Agent": (
+            "Mozilla/5.0 (compatible; OverlandChecker/1.0; "
+            "+https://github.com/yourname/overland-availability-bot)"
+        ),
+        "Accept-Encoding": ACCEPT_ENCODING,
+    }
+)
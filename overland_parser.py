@@ -0,0 +1,197 @@
+# Availability-page parser shared by the scraper entry points.
+#
+# Kept free of network/state code and fully annotated so it can be compiled
+# in place with `mypyc overland_parser.py`; the resulting extension module
+# shadows this file on import, and the pure-Python version is used otherwise.
+import re
+from datetime import date
+from typing import Any, Iterable, Iterator, NamedTuple, Optional, Union, cast
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:  # pragma: no cover - fallback when no selectolax wheel
+    HTMLParser = None  # type: ignore[assignment, misc]
+    import lxml.etree  # type: ignore[import-untyped, unused-ignore]
+    import lxml.html  # type: ignore[import-untyped, unused-ignore]
+
+
+class Day(NamedTuple):
+    dt: date
+    status: Optional[str]
+    spots: Optional[int]
+
+
+# Month abbreviation -> number, keyed by both str and bytes so the text and
+# raw-bytes parsers share it without decoding.
+_MONTH_ABBRS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+                "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+MONTHS: dict[Union[str, bytes], int] = {m: i for i, m in enumerate(_MONTH_ABBRS, 1)}
+MONTHS.update({m.encode(): i for i, m in enumerate(_MONTH_ABBRS, 1)})
+
+_DATE_REGEX = (
+    r"(?P<date>(?:Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday)\s+"
+    r"(?P<day>\d{1,2})\s+(?P<mon>[A-Za-z]{3})\s+(?P<year>\d{4}))"
+)
+
+# One scan: a date heading, a "Fully Booked" marker, or an
+# "[N ]Available" status. Dispatch on m.lastgroup.
+_LINE_REGEX = (
+    _DATE_REGEX
+    + r"|(?P<booked>Fully Booked)"
+    + r"|(?P<avail>(?:(?P<spots>\d+)\s+)?Available)"
+)
+# Extracted text turns &nbsp; into U+00A0, which \s no longer covers under
+# re.ASCII, so the text pattern accepts it explicitly.
+LINE_PATTERN = re.compile(
+    _LINE_REGEX.replace(r"\s", r"[\s\xa0]"),
+    # Everything else matched is ASCII; keeps \d and \s on the byte-range paths.
+    re.ASCII,
+)
+# In raw markup a non-breaking space is still &nbsp;, &#160; or the UTF-8
+# bytes C2 A0, so the bytes patterns take those wherever the template has \s.
+_DOC_SPACE = r"(?:\s|&nbsp;|&#160;|\xc2\xa0)"
+
+
+def _doc_pattern(regex: str) -> "re.Pattern[bytes]":
+    return re.compile(regex.replace(r"\s", _DOC_SPACE).encode("ascii"))
+
+
+# Same pattern over the raw response bytes, so no decode of the whole body
+# (bytes patterns are ASCII-only already).
+DOC_PATTERN = _doc_pattern(_LINE_REGEX)
+# Headings only; tells "no dates in the markup" from "none in the window".
+DOC_DATE_PATTERN = _doc_pattern(_DATE_REGEX)
+
+
+def heading_date(m: "re.Match[Any]") -> Optional[date]:
+    """
+    Date of a heading match, or None for an unknown month or impossible day.
+    """
+    day, mon_abbr, year = m.group("day", "mon", "year")
+    month = MONTHS.get(mon_abbr.title())
+    if not month:
+        return None
+    try:
+        return date(int(year), month, int(day))
+    except ValueError:
+        return None
+
+
+def has_heading_after(
+    data: Union[bytes, bytearray], end: date, pos: int = 0
+) -> bool:
+    """
+    Whether the raw page bytes hold a date heading later than `end`, looking
+    from `pos` on. Lets a streamed read stop once the window is behind it.
+    """
+    for m in DOC_DATE_PATTERN.finditer(data, pos):
+        dt = heading_date(m)
+        if dt is not None and dt > end:
+            return True
+    return False
+
+
+def iter_days(
+    matches: Iterable["re.Match[Any]"],
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> Iterator[Day]:
+    """
+    State machine over LINE_PATTERN / DOC_PATTERN matches, yielding
+    (date, status, spots) for each date heading once the next heading (or
+    the end) is reached.
+
+    Dates before `start` are skipped. The page is chronological, so the
+    first date after `end` stops the scan.
+    """
+    start_year = start.year if start is not None else None
+    end_year = end.year if end is not None else None
+    dt: Optional[date] = None
+    status: Optional[str] = None
+    spots: Optional[int] = None
+
+    for m in matches:
+        kind = m.lastgroup
+        if kind == "date":
+            if dt is not None:
+                yield Day(dt, status, spots)
+
+            # Out-of-window years are decided on the integer alone, before
+            # any date object is built
+            year = int(m.group("year"))
+            if end_year is not None and year > end_year:
+                return
+            if start_year is not None and year < start_year:
+                dt = None
+            else:
+                # An invalid heading leaves dt None, so lines up to the next
+                # heading belong to no date
+                dt = heading_date(m)
+            if dt is not None:
+                if end is not None and dt > end:
+                    return
+                if start is not None and dt < start:
+                    dt = None
+            status = None
+            spots = None
+        elif dt is None:
+            continue
+        elif kind == "booked":
+            status = "Fully Booked"
+        elif kind == "avail":
+            if status is None:
+                status = "Available"
+            count = m.group("spots")
+            if count:
+                # "X Available"
+                spots = int(count)
+
+    if dt is not None:
+        yield Day(dt, status, spots)
+
+
+def html_to_text(html: Union[str, bytes]) -> str:
+    """
+    Visible page text, one text node per line, via a C tokenizer.
+    """
+    if HTMLParser is not None:
+        body = HTMLParser(html).body
+        return body.text(separator="\n") if body is not None else ""
+    if isinstance(html, bytes):
+        # Without a declared charset lxml assumes Latin-1, which splits a
+        # UTF-8 NBSP into "\xc2\xa0"; the page is served as UTF-8
+        html = html.decode("utf-8", errors="replace")
+    try:
+        root = lxml.html.fromstring(html)
+    except lxml.etree.ParserError:
+        # Empty, whitespace-only or comment-only document: no text, no dates
+        return ""
+    # Parsed from str, so every text node is str
+    return "\n".join(cast(Iterator[str], root.itertext()))
+
+
+def parse_text(
+    text: str, start: Optional[date] = None, end: Optional[date] = None
+) -> list[Day]:
+    """
+    Run LINE_PATTERN straight over extracted page text; no line list.
+    """
+    return list(iter_days(LINE_PATTERN.finditer(text), start, end))
+
+
+def parse(
+    html_bytes: bytes, start: Optional[date] = None, end: Optional[date] = None
+) -> list[Day]:
+    """
+    VERY simple parser: just report everything it sees on the page, limited
+    to [start, end] when given.
+    """
+    # Fast path: the headings and statuses are plain text in the markup, so
+    # one finditer over the raw HTML finds them without building a tree.
+    results = list(iter_days(DOC_PATTERN.finditer(html_bytes), start, end))
+    if results or DOC_DATE_PATTERN.search(html_bytes):
+        return results
+
+    # Headings split across tags (or entity-encoded): use the visible text,
+    # where \s also absorbs the newlines between text nodes.
+    return parse_text(html_to_text(html_bytes), start, end)
@@ -1,134 +1,260 @@
 import os
-import re
-from datetime import datetime, date
+from datetime import date
+from pathlib import Path
 
 import requests
-from bs4 import BeautifulSoup
+import xxhash
+
+from http_session import REQUEST_TIMEOUT, SESSION
+from overland_parser import has_heading_after, parse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback, same output bytes
+    orjson = None  # type: ignore[assignment]
+    import json
+
+STATE_FILE = Path(__file__).with_name("state.json")
 
 URL = "https://azapps.customlinc.com.au/tasparksoverland/BookingCat/Availability/?Category=OVERLAND"
 
 # We keep your window: from today to 31 May 2026
 END_DATE = date(2026, 5, 31)
+END_DATE_LABEL = END_DATE.strftime("%d %b %Y")
 
 
 def get_start_date() -> date:
     return date.today()
 
 
-DATE_PATTERN = re.compile(
-    r"(Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday)\s+"
-    r"(\d{1,2})\s+([A-Za-z]{3})\s+(\d{4})"
-)
-
+def _dumps(obj, pretty: bool = False) -> bytes:
+    if orjson is not None:
+        option = orjson.OPT_SORT_KEYS | orjson.OPT_INDENT_2 if pretty else None
+        return orjson.dumps(obj, option=option)
+    if pretty:
+        text = json.dumps(obj, sort_keys=True, indent=2, ensure_ascii=False)
+    else:
+        text = json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+    return text.encode("utf-8")
 
-def parse_availability_from_html(html_text):
-    """
-    VERY simple parser: just report everything it sees on the page.
-    """
-    soup = BeautifulSoup(html_text, "html.parser")
-    text = soup.get_text(separator="\n")
-    lines = [line.strip() for line in text.splitlines() if line.strip()]
 
-    results = []
+def load_previous_state() -> dict:
+    try:
+        data = STATE_FILE.read_bytes()
+    except FileNotFoundError:
+        return {}
+    try:
+        return orjson.loads(data) if orjson is not None else json.loads(data)
+    except ValueError:
+        return {}
 
-    date_indices = []
-    for i, line in enumerate(lines):
-        if DATE_PATTERN.search(line):
-            date_indices.append(i)
 
-    for idx, start_idx in enumerate(date_indices):
-        end_idx = date_indices[idx + 1] if idx + 1 < len(date_indices) else len(lines)
-        block = lines[start_idx:end_idx]
+def load_availabilities(state: dict) -> list:
+    """
+    Stored availabilities as (iso_date, spots) tuples; older state files
+    hold {"date", "spots"} records instead of pairs.
+    """
+    return [
+        (a["date"], a["spots"]) if isinstance(a, dict) else tuple(a)
+        for a in state.get("availabilities", [])
+    ]
 
-        m = DATE_PATTERN.search(block[0])
-        if not m:
-            continue
 
-        _, day, mon_abbr, year = m.groups()
-        date_str = f"{day} {mon_abbr} {year}"
+def save_state(state: dict):
+    # Write alongside and rename, so a crash never leaves a truncated file
+    tmp = STATE_FILE.with_suffix(".json.tmp")
+    tmp.write_bytes(_dumps(state, pretty=True))
+    os.replace(tmp, STATE_FILE)
 
-        try:
-            dt = datetime.strptime(date_str, "%d %b %Y").date()
-        except ValueError:
-            continue
 
-        status = None
-        spots = None
+# Longest plausible heading ("Wednesday 30 Sep 2026" plus spacing); re-scanned
+# from the previous chunk so a heading split across chunks is still seen
+_HEADING_OVERLAP = 64
 
-        for line in block[1:]:
-            if "Fully Booked" in line:
-                status = "Fully Booked"
-            elif "Available" in line and status is None:
-                status = "Available"
 
-            if "Available" in line:
-                # Look for "X Available"
-                m2 = re.search(r"(\d+)\s+Available", line)
-                if m2:
-                    spots = int(m2.group(1))
+def read_relevant_body(resp, end: date) -> bytes:
+    """
+    Read a streamed page only up to the first date heading after `end`. The
+    page is chronological, so nothing past it can fall in the window.
+    """
+    body = bytearray()
+    for chunk in resp.iter_content(chunk_size=16384):
+        pos = max(0, len(body) - _HEADING_OVERLAP)
+        body += chunk
+        if has_heading_after(body, end, pos):
+            break
+    return bytes(body)
 
-        results.append((dt, status, spots))
 
-    return results
+def _chunked(text: str, limit: int = 4000):
+    """
+    Split text into pieces under Telegram's 4096-char cap, on line breaks
+    where possible (an overlong single line is cut hard).
+    """
+    chunk = ""
+    for line in text.split("\n"):
+        while len(line) > limit:
+            if chunk:
+                yield chunk
+                chunk = ""
+            yield line[:limit]
+            line = line[limit:]
+        if chunk and len(chunk) + 1 + len(line) > limit:
+            yield chunk
+            chunk = line
+        else:
+            chunk = f"{chunk}\n{line}" if chunk else line
+    if chunk:
+        yield chunk
 
 
 def send_telegram_message(text: str):
     token = os.environ["TELEGRAM_BOT_TOKEN"]
     chat_id = os.environ["TELEGRAM_CHAT_ID"]
 
+    pieces = list(_chunked(text))
+    if not pieces:
+        print("Empty Telegram message; nothing sent.")
+        return
+
     url = f"https://api.telegram.org/bot{token}/sendMessage"
-    resp = requests.post(url, data={"chat_id": chat_id, "text": text})
-    print("Telegram status code:", resp.status_code)
-    print("Telegram response:", resp.text)
-    resp.raise_for_status()
+    # Every piece goes over the same kept-alive api.telegram.org connection
+    for i, piece in enumerate(pieces):
+        try:
+            resp = SESSION.post(
+                url, data={"chat_id": chat_id, "text": piece}, timeout=REQUEST_TIMEOUT
+            )
+            print("Telegram status code:", resp.status_code)
+            print("Telegram response:", resp.text)
+            resp.raise_for_status()
+        except requests.RequestException as exc:
+            if i == 0:
+                # Nothing delivered yet: fail the run so it is retried whole
+                raise
+            # Earlier pieces already arrived; raising would leave state unsaved
+            # and re-send them all next run, so keep the partial alert instead
+            print(f"Telegram piece {i + 1}/{len(pieces)} failed, rest dropped: {exc}")
+            return
     print("Telegram notification sent.")
 
 
-def check_overland():
-    start_date = get_start_date()
-    print(f"Checking availability page: {URL}")
-    print(f"Window: {start_date} to {END_DATE}")
+def format_day(iso_date: str) -> str:
+    return date.fromisoformat(iso_date).strftime("%A %d %b %Y")
 
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (compatible; OverlandChecker/1.0; "
-            "+https://github.com/yourname/overland-availability-bot)"
-        )
-    }
 
-    resp = requests.get(URL, headers=headers, timeout=30)
-    resp.raise_for_status()
-
-    all_days = parse_availability_from_html(resp.text)
-    print(f"Found {len(all_days)} date entries on the page.")
-
-    # Build a debug message for Telegram
+def build_debug_message(start_date, in_window, added, removed) -> str:
     lines = [
         "🔍 Debug run: Overland availability (FIRST PAGE ONLY)",
-        f"Window: {start_date.strftime('%d %b %Y')} – {END_DATE.strftime('%d %b %Y')}",
+        f"Window: {start_date.strftime('%d %b %Y')} – {END_DATE_LABEL}",
         "",
-        f"Total dates on first page: {len(all_days)}",
+        f"In window (today–{END_DATE_LABEL}): {len(in_window)} dates",
         "",
         "Sample:",
     ]
 
     # Take up to first 10 items to keep message small
-    for dt, status, spots in all_days[:10]:
-        date_str = dt.strftime("%A %d %b %Y")
-        lines.append(f"- {date_str}: status={status}, spots={spots}")
-
-    # Also show how many entries in the window
-    in_window = [
-        (dt, status, spots)
-        for dt, status, spots in all_days
-        if start_date <= dt <= END_DATE
-    ]
-    lines.append("")
-    lines.append(f"In window (today–31 May 2026): {len(in_window)} dates")
+    for day in in_window[:10]:
+        date_str = day.dt.strftime("%A %d %b %Y")
+        lines.append(f"- {date_str}: status={day.status}, spots={day.spots}")
+
+    if added:
+        lines.append("")
+        lines.append("Newly available:")
+        for iso_date, spots in added:
+            lines.append(f"- {format_day(iso_date)}: spots={spots}")
+    if removed:
+        lines.append("")
+        lines.append("No longer available:")
+        for iso_date, spots in removed:
+            lines.append(f"- {format_day(iso_date)}: spots={spots}")
 
-    text = "\n".join(lines)
-    send_telegram_message(text)
+    return "\n".join(lines)
+
+
+def check_overland():
+    start_date = get_start_date()
+    print(f"Checking availability page: {URL}")
+    print(f"Window: {start_date} to {END_DATE}")
+
+    state = load_previous_state()
+    previous_state = dict(state)
+
+    # Conditional GET: the server answers 304 if the page is unchanged
+    headers = {}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+
+    with SESSION.get(
+        URL, headers=headers, timeout=REQUEST_TIMEOUT, stream=True
+    ) as resp:
+        if resp.status_code == 304:
+            print("Availability page unchanged since last run (HTTP 304).")
+            return
+        resp.raise_for_status()
+        # Closing the response early drops the unread tail of the page
+        body = read_relevant_body(resp, END_DATE)
+
+    # Servers without validators still mostly return byte-identical pages;
+    # hashing only the relevant prefix also ignores changes past END_DATE
+    digest = xxhash.xxh3_64_intdigest(body)
+    if digest == state.get("content_digest"):
+        print("Availability page content unchanged since last run.")
+        return
+
+    # Out-of-window dates are dropped while parsing
+    in_window = parse(body, start_date, END_DATE)
+    print(f"Found {len(in_window)} date entries in the window.")
+
+    # (iso_date, spots) pairs: compared as plain tuples, stored as JSON pairs
+    current_state = [
+        (day.dt.isoformat(), day.spots)
+        for day in in_window
+        if day.status == "Available"
+    ]
+    # One 64-bit digest decides "changed?" instead of an element-wise compare
+    current_digest = xxhash.xxh3_64_intdigest(_dumps(current_state))
+
+    if current_digest == state.get("availabilities_digest"):
+        print("No change in availability; not notifying.")
+    else:
+        # Both lists are already in date order, so filter instead of sorting
+        # Dates the calendar has moved past were not booked out; drop them
+        # so they never show up as "No longer available"
+        previous_list = [
+            a
+            for a in load_availabilities(state)
+            if date.fromisoformat(a[0]) >= start_date
+        ]
+        previous = set(previous_list)
+        current = set(current_state)
+        added = [a for a in current_state if a not in previous]
+        removed = [a for a in previous_list if a not in current]
+
+        if added or removed:
+            send_telegram_message(
+                build_debug_message(start_date, in_window, added, removed)
+            )
+
+        state["availabilities"] = current_state
+        state["availabilities_digest"] = current_digest
+
+    # Only remember the validators once the run has fully succeeded, so a
+    # failed send is retried on the next run instead of getting a 304.
+    for key, header in (("etag", "ETag"), ("last_modified", "Last-Modified")):
+        value = resp.headers.get(header)
+        if value:
+            state[key] = value
+        else:
+            state.pop(key, None)
+    state["content_digest"] = digest
+    if state != previous_state:
+        save_state(state)
 
 
 if __name__ == "__main__":
-    check_overland()
+    try:
+        check_overland()
+    finally:
+        SESSION.close()
@@ -1,5 +1,6 @@
 import os
-import requests
+
+from http_session import REQUEST_TIMEOUT, SESSION
 
 def main():
     token = os.environ["TELEGRAM_BOT_TOKEN"]
@@ -8,11 +9,16 @@ def main():
     url = f"https://api.telegram.org/bot{token}/sendMessage"
     text = "✅ Test message from GitHub Actions (test_telegram.py)"
 
-    resp = requests.post(url, data={"chat_id": chat_id, "text": text})
+    resp = SESSION.post(
+        url, data={"chat_id": chat_id, "text": text}, timeout=REQUEST_TIMEOUT
+    )
     print("Status code:", resp.status_code)
     print("Response text:", resp.text)
     resp.raise_for_status()
     print("Done.")
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        SESSION.close()